@@ -6,6 +6,10 @@ import platform
 import shutil
 import csv
 import statistics
+import argparse
+import hashlib
+import io
+import json
 
 SERVER_IP = "127.0.0.1"
 SERVER_PORT = 5005
@@ -21,6 +25,19 @@ INTERFACE = "lo" if not IS_WINDOWS else None
 
 HEADER_SIZE = 12
 
+CACHE_FILE = ".phase2_cache.json"
+CACHE_VERSION = 2
+PREFIX_WINDOW = 4096
+FOLLOW_INTERVAL = 2.0
+
+SCENARIOS = [
+    ("baseline", 1),
+    ("baseline", 5),
+    ("baseline", 30),
+    ("loss_5pct", 1),
+    ("jitter_test", 1),
+]
+
 def log(msg):
     print(f"[{time.strftime('%H:%M:%S')}] {msg}")
 
@@ -103,6 +120,70 @@ def clean_netem():
     else:
         print("\n[REMINDER] Stop Clumsy before next test!\n")
 
+def new_run_state():
+    return {
+        "packets_received": 0,
+        "duplicate_count": 0,
+        "gap_count": 0,
+        "total_cpu_ms": 0.0,
+        "latency_sum": 0,
+        "latency_count": 0,
+        "previous_seq": -1,
+        "last_timestamp": None,
+    }
+
+def accumulate_rows(state, rows):
+    # rows must already be sorted by timestamp and come after every row
+    # previously accumulated into state.
+    for row in rows:
+        seq = int(row.get("seq", -1))
+        previous_seq = state["previous_seq"]
+
+        if seq == previous_seq:
+            state["duplicate_count"] += 1
+        elif previous_seq != -1 and seq > previous_seq + 1:
+            state["gap_count"] += seq - previous_seq - 1
+
+        state["previous_seq"] = seq
+        state["packets_received"] += 1
+        state["total_cpu_ms"] += float(row.get("cpu_ms_per_report", 0.0))
+
+        try:
+            ts_sent_masked = int(row.get("timestamp", 0))
+            arrival_full = float(row.get("arrival_time", 0))
+            arrival_masked = int(arrival_full * 1000) & 0xFFFFFFFF
+            diff = arrival_masked - ts_sent_masked
+            if diff < -1000000000:
+                diff += 2**32
+            if diff >= 0:
+                state["latency_sum"] += diff
+                state["latency_count"] += 1
+        except ValueError:
+            pass
+
+    if rows:
+        state["last_timestamp"] = int(rows[-1].get("timestamp", 0))
+
+def finalize_stats(state):
+    packets_received = state["packets_received"]
+    if not packets_received:
+        return None
+
+    latency_count = state["latency_count"]
+
+    return {
+        "packets_received": packets_received,
+        "avg_latency": state["latency_sum"] / latency_count if latency_count else 0.0,
+        "duplicate_rate": state["duplicate_count"] / packets_received,
+        "gap_count": state["gap_count"],
+        "cpu_ms": state["total_cpu_ms"] / packets_received,
+        "bytes_per_report": HEADER_SIZE + (BATCH_SIZE * 4),
+    }
+
+def sort_rows(rows):
+    rows.sort(key=lambda x: int(x.get("timestamp", 0)))
+    return rows
+
 def analyze_single_run(csv_file):
     if not os.path.exists(csv_file):
         log(f"[ERR] CSV file {csv_file} not found.")
@@ -122,53 +203,136 @@ def analyze_single_run(csv_file):
     if not rows:
         return None
 
-    rows.sort(key=lambda x: int(x.get("timestamp", 0)))
-
-    packets_received = len(rows)
-    duplicate_count = 0
-    gap_count = 0
-    total_cpu_ms = 0.0
-    latencies = []
-
-    bytes_per_report = HEADER_SIZE + (BATCH_SIZE * 4)
+    state = new_run_state()
+    accumulate_rows(state, sort_rows(rows))
+    return finalize_stats(state)
 
-    previous_seq = -1
-
-    for row in rows:
-        seq = int(row.get("seq", -1))
+def load_cache(cache_path):
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError) as e:
+        log(f"[WARN] Ignoring unreadable cache {cache_path}: {e}")
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+        return {}
+    runs = cache.get("runs")
+    if not isinstance(runs, dict):
+        log(f"[WARN] Ignoring malformed cache {cache_path}")
+        return {}
+    return runs
+
+def save_cache(cache, cache_path):
+    tmp_path = cache_path + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({"version": CACHE_VERSION, "runs": cache}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        log(f"[WARN] Could not write cache {cache_path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
 
-        if seq == previous_seq:
-            duplicate_count += 1
-        elif previous_seq != -1 and seq > previous_seq + 1:
-            gap_count += seq - previous_seq - 1
+def parse_csv_text(text, fieldnames=None):
+    reader = csv.DictReader(io.StringIO(text), fieldnames=fieldnames)
+    if fieldnames is None and reader.fieldnames:
+        reader.fieldnames = [name.strip() for name in reader.fieldnames]
+    return list(reader), reader.fieldnames
+
+def append_rows(f, entry, st):
+    # Folds rows appended past entry["offset"] into the entry. Returns False
+    # when the file changed in some other way and must be re-analyzed.
+    offset = entry["offset"]
+    window_start = max(0, offset - PREFIX_WINDOW)
+    f.seek(window_start)
+    window = f.read(offset - window_start)
+    if hashlib.sha256(window).hexdigest() != entry["window_digest"]:
+        return False
+
+    tail = f.read()
+    end = tail.rfind(b"\n") + 1
+    new_rows, _ = parse_csv_text(tail[:end].decode(), entry["fieldnames"])
+    sort_rows(new_rows)
+
+    # Appended rows can only be folded in if they sort after everything
+    # already seen; a late out-of-order row forces a full re-analysis.
+    last_timestamp = entry["state"]["last_timestamp"]
+    if new_rows and last_timestamp is not None and \
+            int(new_rows[0].get("timestamp", 0)) < last_timestamp:
+        return False
+
+    state = dict(entry["state"])
+    accumulate_rows(state, new_rows)
+    entry.update(
+        size=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+        offset=offset + end,
+        # The full-content digest is only known after reading everything;
+        # size and mtime identify this version of the file until it changes.
+        # Only the window before the old offset was checked, so an edit made
+        # earlier in a file that also grew is not detected here.
+        digest=None,
+        window_digest=hashlib.sha256((window + tail[:end])[-PREFIX_WINDOW:]).hexdigest(),
+        state=state,
+    )
+    return True
 
-        previous_seq = seq
-        total_cpu_ms += float(row.get("cpu_ms_per_report", 0.0))
+def cached_analyze(csv_file, cache):
+    key = os.path.abspath(csv_file)
+    try:
+        st = os.stat(csv_file)
+    except OSError:
+        log(f"[ERR] CSV file {csv_file} not found.")
+        return None
 
-        try:
-            ts_sent_masked = int(row.get("timestamp", 0))
-            arrival_full = float(row.get("arrival_time", 0))
-            arrival_masked = int(arrival_full * 1000) & 0xFFFFFFFF
-            diff = arrival_masked - ts_sent_masked
-            if diff < -1000000000:
-                diff += 2**32
-            if diff >= 0:
-                latencies.append(diff)
-        except ValueError:
-            pass
+    entry = cache.get(key)
+    if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+        return finalize_stats(entry["state"])
 
-    avg_latency = statistics.mean(latencies) if latencies else 0.0
-    duplicate_rate = duplicate_count / packets_received if packets_received else 0.0
-    avg_cpu_ms = total_cpu_ms / packets_received if packets_received else 0.0
+    try:
+        with open(csv_file, "rb") as f:
+            if entry and entry["fieldnames"] and st.st_size > entry["size"]:
+                if append_rows(f, entry, st):
+                    return finalize_stats(entry["state"])
+                f.seek(0)
+            data = f.read()
+
+        # Only complete lines are consumed, so a row the server is still writing
+        # is picked up on the next call instead of being parsed half-written.
+        offset = data.rfind(b"\n") + 1
+        body = data[:offset]
+        digest = hashlib.sha256(body).hexdigest()
+
+        if entry and entry["digest"] == digest:
+            entry["size"], entry["mtime_ns"] = st.st_size, st.st_mtime_ns
+            return finalize_stats(entry["state"])
+
+        rows, fieldnames = parse_csv_text(body.decode())
+        state = new_run_state()
+        accumulate_rows(state, sort_rows(rows))
+    except (OSError, ValueError, csv.Error) as e:
+        log(f"[ERR] Failed to read CSV: {e}")
+        return None
 
-    return {
-        "packets_received": packets_received,
-        "avg_latency": avg_latency,
-        "duplicate_rate": duplicate_rate,
-        "gap_count": gap_count,
-        "cpu_ms": avg_cpu_ms,
-        "bytes_per_report": bytes_per_report,
+    cache[key] = {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "offset": offset,
+        "digest": digest,
+        "window_digest": hashlib.sha256(body[-PREFIX_WINDOW:]).hexdigest(),
+        "fieldnames": fieldnames,
+        "state": state,
     }
+    return finalize_stats(state)
+
+def analyze_run(csv_file, cache):
+    if cache is None:
+        return analyze_single_run(csv_file)
+    return cached_analyze(csv_file, cache)
 
 def print_aggregated_stats(scenario_name, results_list):
     if not results_list:
@@ -200,8 +364,61 @@ def print_aggregated_stats(scenario_name, results_list):
 
     return statistics.median(latencies)
 
+def print_latency_impact(baseline_latency_1s, test_latency_jitter):
+    print("\n" + "=" * 50)
+    print("LATENCY IMPACT ANALYSIS (100ms DELAY TEST)")
+    print("=" * 50)
+    print(f"Baseline Median Latency (1s): {baseline_latency_1s:8.3f} ms")
+    print(f"Jitter Test Median Latency:   {test_latency_jitter:8.3f} ms")
+    diff = test_latency_jitter - baseline_latency_1s
+    print("-" * 50)
+    print(f"OBSERVED DELAY INCREASE:      {diff:8.3f} ms")
+
+    if 80.0 <= diff <= 120.0:
+        print("RESULT: [PASS] Matches target 100ms delay")
+    else:
+        print("RESULT: [FAIL] Deviation > 20ms from target")
+    print("=" * 50 + "\n")
+
+def analyze_existing(cache):
+    medians = {}
+    for scenario_name, interval in SCENARIOS:
+        run_results = []
+        for i in range(1, RUNS_PER_SCENARIO + 1):
+            csv_file = f"results_{scenario_name}_{interval}s_run{i}.csv"
+            if not os.path.exists(csv_file):
+                continue
+            stats = analyze_run(csv_file, cache)
+            if stats:
+                run_results.append(stats)
+        medians[(scenario_name, interval)] = print_aggregated_stats(
+            f"{scenario_name}_{interval}s", run_results
+        )
+
+    print_latency_impact(
+        medians.get(("baseline", 1)) or 0.0,
+        medians.get(("jitter_test", 1)) or 0.0,
+    )
+
+def follow_log(csv_file, cache, interval):
+    log(f"Following {csv_file} every {interval}s (Ctrl+C to stop)")
+    last_stats = None
+    try:
+        while True:
+            stats = analyze_run(csv_file, cache)
+            if stats and stats != last_stats:
+                last_stats = stats
+                log(
+                    f"{csv_file}: Packets={stats['packets_received']}, "
+                    f"Latency={stats['avg_latency']:.2f}ms, "
+                    f"DupRate={stats['duplicate_rate']:.2%}, Gaps={stats['gap_count']}"
+                )
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\n[STOP] Interrupted.")
+
 def run_scenario_batch(
-    scenario_name, interval, loss, delay, jitter, tshark_bin, interface_id
+    scenario_name, interval, loss, delay, jitter, tshark_bin, interface_id, cache=None
 ):
     run_results = []
 
@@ -299,7 +516,7 @@ def run_scenario_batch(
             if cap_proc:
                 cap_proc.terminate()
 
-        stats = analyze_single_run(csv_file)
+        stats = analyze_run(csv_file, cache)
         if stats:
             run_results.append(stats)
             print(
@@ -315,7 +532,32 @@ def run_scenario_batch(
 
     return print_aggregated_stats(f"{scenario_name}_{interval}s", run_results)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="IoTStream Phase 2 experiment suite")
+    parser.add_argument("--analyze-only", action="store_true",
+                        help="Summarize existing results_*.csv files without running experiments")
+    parser.add_argument("--follow", metavar="CSV",
+                        help="Incrementally re-analyze a growing server log")
+    parser.add_argument("--follow-interval", type=float, default=FOLLOW_INTERVAL)
+    parser.add_argument("--cache", default=CACHE_FILE)
+    parser.add_argument("--no-cache", action="store_true")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    cache = None if args.no_cache else load_cache(args.cache)
+
+    if args.analyze_only or args.follow:
+        try:
+            if args.follow:
+                follow_log(args.follow, cache, args.follow_interval)
+            else:
+                analyze_existing(cache)
+        finally:
+            if cache is not None:
+                save_cache(cache, args.cache)
+        sys.exit(0)
+
     check_requirements()
     tshark_bin = get_tshark_path()
     if IS_WINDOWS:
@@ -329,46 +571,36 @@ if __name__ == "__main__":
         print(f"\n{'='*20} STARTING BASELINE SUITE (1s, 5s, 30s) {'='*20}")
 
         val = run_scenario_batch(
-            "baseline", 1, 0, 0, 0, tshark_bin, target_interface
+            "baseline", 1, 0, 0, 0, tshark_bin, target_interface, cache
         )
         if val:
             baseline_latency_1s = val
 
         run_scenario_batch(
-            "baseline", 5, 0, 0, 0, tshark_bin, target_interface
+            "baseline", 5, 0, 0, 0, tshark_bin, target_interface, cache
         )
         run_scenario_batch(
-            "baseline", 30, 0, 0, 0, tshark_bin, target_interface
+            "baseline", 30, 0, 0, 0, tshark_bin, target_interface, cache
         )
 
         print(f"\n{'='*20} STARTING LOSS SCENARIO {'='*20}")
         run_scenario_batch(
-            "loss_5pct", 1, 5, 0, 0, tshark_bin, target_interface
+            "loss_5pct", 1, 5, 0, 0, tshark_bin, target_interface, cache
         )
 
         print(f"\n{'='*20} STARTING JITTER SCENARIO {'='*20}")
         test_latency_jitter = 0.0
         val = run_scenario_batch(
-            "jitter_test", 1, 0, 100, 10, tshark_bin, target_interface
+            "jitter_test", 1, 0, 100, 10, tshark_bin, target_interface, cache
         )
         if val:
             test_latency_jitter = val
 
-        print("\n" + "=" * 50)
-        print("LATENCY IMPACT ANALYSIS (100ms DELAY TEST)")
-        print("=" * 50)
-        print(f"Baseline Median Latency (1s): {baseline_latency_1s:8.3f} ms")
-        print(f"Jitter Test Median Latency:   {test_latency_jitter:8.3f} ms")
-        diff = test_latency_jitter - baseline_latency_1s
-        print("-" * 50)
-        print(f"OBSERVED DELAY INCREASE:      {diff:8.3f} ms")
-
-        if 80.0 <= diff <= 120.0:
-            print("RESULT: [PASS] Matches target 100ms delay")
-        else:
-            print("RESULT: [FAIL] Deviation > 20ms from target")
-        print("=" * 50 + "\n")
+        print_latency_impact(baseline_latency_1s, test_latency_jitter)
 
     except KeyboardInterrupt:
         print("\n[STOP] Interrupted.")
-        clean_netem()
\ No newline at end of file
+        clean_netem()
+    finally:
+        if cache is not None:
+            save_cache(cache, args.cache)
@@ -0,0 +1,454 @@
+import argparse
+import csv
+import gc
+import json
+import math
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import client
+import server
+
+DEFAULT_OUTPUT = "bench_results.json"
+DEFAULT_THRESHOLD = 0.15
+REPEATS = 11
+STARTUP_REPEATS = 21
+MIN_WINDOW = 0.25
+
+BUILD_ITERATIONS = 50000
+PROCESS_PACKETS = 20000
+PROCESS_DEVICES = 10
+MEMORY_DEVICES = 100
+MEMORY_SEQS_PER_DEVICE = 2000
+CSV_ROWS = 50000
+E2E_PACKETS = 20000
+CLIENT_SENDS = 20000
+ALLOC_SENDS = 200
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+CLIENT_STARTUP = "import client; client.parse_args(['--port', '5005', '--log-level', 'quiet'])"
+BATCH_SIZE = 5
+
+PACKET_MIXES = {
+    "in_order": (0.0, 0.0),
+    "dup_10pct": (0.10, 0.0),
+    "gap_10pct": (0.0, 0.10),
+    "mixed": (0.05, 0.05),
+}
+
+def log(msg):
+    print(f"[Bench] {msg}")
+
+class NullWriter:
+    def writerow(self, row):
+        pass
+
+def metric(value, unit, better, spread=0.0, gate=True):
+    # spread is the relative gap between the best and the median repeat;
+    # compare() only flags changes larger than the spread of both runs.
+    # gate=False metrics are reported but never fail a comparison.
+    return {"value": value, "unit": unit, "better": better, "spread": spread, "gate": gate}
+
+def relative_spread(samples):
+    # How far the median repeat sits above the best one. Unlike max - min,
+    # one repeat hit by a stray scheduler stall doesn't inflate it.
+    best = min(samples)
+    return (statistics.median(samples) - best) / best if best else 0.0
+
+def best_of(fn, repeats=REPEATS):
+    # Each repeat runs fn enough times to fill MIN_WINDOW seconds, so timer
+    # resolution and scheduler hiccups are a small share of every sample.
+    # Returns the fastest per-call time and the spread across repeats.
+    start = time.perf_counter()
+    fn()
+    loops = max(1, math.ceil(MIN_WINDOW / (time.perf_counter() - start)))
+
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        timings.append((time.perf_counter() - start) / loops)
+    return min(timings), relative_spread(timings)
+
+def reset_server_state():
+    server.device_states.clear()
+    server.shutdown_event.clear()
+
+def bench_build_packet():
+    payload, _ = client.build_payload(BATCH_SIZE)
+    now = time.time()
+
+    def run():
+        for seq in range(BUILD_ITERATIONS):
+            client.build_packet(1, client.MSG_DATA, 1001, seq & 0xFFFF, now, BATCH_SIZE, payload)
+
+    elapsed, spread = best_of(run)
+    return metric(BUILD_ITERATIONS / elapsed, "ops/s", "higher", spread)
+
+def bench_build_payload():
+    def run():
+        for _ in range(BUILD_ITERATIONS):
+            client.build_payload(BATCH_SIZE)
+
+    elapsed, spread = best_of(run)
+    return metric(BUILD_ITERATIONS / elapsed, "ops/s", "higher", spread)
+
+def make_packet_stream(dup_rate, gap_rate, rng):
+    payload, _ = client.build_payload(BATCH_SIZE)
+    next_seq = {dev: 0 for dev in range(1, PROCESS_DEVICES + 1)}
+    last_packet = {}
+    packets = []
+    now = time.time()
+
+    while len(packets) < PROCESS_PACKETS:
+        dev = rng.randint(1, PROCESS_DEVICES)
+        roll = rng.random()
+        if roll < dup_rate and dev in last_packet:
+            packets.append(last_packet[dev])
+            continue
+        if roll < dup_rate + gap_rate:
+            next_seq[dev] += rng.randint(1, 3)
+
+        seq = next_seq[dev] & 0xFFFF
+        next_seq[dev] += 1
+        pkt = client.build_packet(1, client.MSG_DATA, dev, seq, now, BATCH_SIZE, payload)
+        last_packet[dev] = pkt
+        packets.append(pkt)
+
+    return packets
+
+def bench_process_packet(dup_rate, gap_rate):
+    packets = make_packet_stream(dup_rate, gap_rate, random.Random(361))
+    writer = NullWriter()
+    addr = ("127.0.0.1", 0)
+
+    def run():
+        reset_server_state()
+        for pkt in packets:
+            server.process_packet(pkt, addr, writer)
+
+    elapsed, spread = best_of(run)
+    reset_server_state()
+    return metric(elapsed / len(packets) * 1e9, "ns/packet", "lower", spread)
+
+def bench_device_memory():
+    payload, _ = client.build_payload(BATCH_SIZE)
+    now = time.time()
+    writer = NullWriter()
+    addr = ("127.0.0.1", 0)
+
+    reset_server_state()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for dev in range(MEMORY_DEVICES):
+        for seq in range(MEMORY_SEQS_PER_DEVICE):
+            # Packets are built inside the traced window but dropped right away,
+            # so only the retained DeviceState objects show up in the delta.
+            pkt = client.build_packet(1, client.MSG_DATA, dev, seq, now, BATCH_SIZE, payload)
+            server.process_packet(pkt, addr, writer)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    reset_server_state()
+
+    return metric((after - before) / MEMORY_DEVICES, "bytes/device", "lower")
+
+def bench_csv_write():
+    row = [1001, 42, 410486185, f"{time.time():.6f}", 0, 0, "0.0304"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.csv")
+
+        def run():
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(server.CSV_COLUMNS)
+                for _ in range(CSV_ROWS):
+                    writer.writerow(row)
+                    f.flush()
+
+        elapsed, spread = best_of(run)
+
+    return metric(CSV_ROWS / elapsed, "rows/s", "higher", spread)
+
+def importtime_modules(code):
+    # -X importtime writes "import time: self | cumulative | name" to stderr;
+    # top-level imports are the ones whose name is not indented.
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_DIR, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line.split("|")
+        name = fields[2].rstrip()
+        if fields[1].strip().isdigit() and not name.startswith("  "):
+            modules[name.strip()] = int(fields[1])
+    return modules
+
+def bench_client_startup():
+    baseline = importtime_modules("pass")
+    timings = []
+    for _ in range(STARTUP_REPEATS):
+        modules = importtime_modules(CLIENT_STARTUP)
+        timings.append(sum(us for name, us in modules.items() if name not in baseline))
+    # Cold imports depend on the page cache and process startup, so this is
+    # tracked but too noisy to gate on.
+    return metric(min(timings), "us", "lower", relative_spread(timings), gate=False)
+
+def count_send_allocations(send, sink):
+    # A snapshot is taken at every Python/C call and return during each send,
+    # and the client.py blocks that appeared since the previous one are added
+    # up. Each step is a single call, so objects that are created and freed
+    # again within the send (ints, iterators, non-freelist floats) are still
+    # counted. The profiler forces a frame object into existence on every
+    # Python "call" event; it shows up on the def line and is left out.
+    only_client = [tracemalloc.Filter(True, client.__file__)]
+    blocks = 0
+    size = 0
+    previous = None
+
+    def on_event(frame, event, arg):
+        nonlocal previous, blocks, size
+        snapshot = tracemalloc.take_snapshot().filter_traces(only_client)
+        if previous is not None:
+            for stat in snapshot.compare_to(previous, "lineno"):
+                if event == "call" and stat.traceback[0].lineno == frame.f_code.co_firstlineno:
+                    continue
+                if stat.count_diff > 0:
+                    blocks += stat.count_diff
+                    size += max(0, stat.size_diff)
+        previous = snapshot
+
+    gc.disable()
+    tracemalloc.start()
+    for seq in range(ALLOC_SENDS):
+        previous = None
+        sys.setprofile(on_event)
+        send(seq)
+        sys.setprofile(None)
+        try:
+            sink.recv(64)
+        except BlockingIOError:
+            pass
+    tracemalloc.stop()
+    gc.enable()
+
+    return blocks / ALLOC_SENDS, size / ALLOC_SENDS
+
+def bench_client_send():
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    sink.setblocking(False)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    addr = sink.getsockname()
+    packets = client.PacketBuffer(BATCH_SIZE)
+    now = time.time()
+
+    def run():
+        for seq in range(CLIENT_SENDS):
+            sock.sendto(packets.data(1, 1001, seq & 0xFFFF, now), addr)
+            try:
+                sink.recv(64)
+            except BlockingIOError:
+                pass
+
+    elapsed, spread = best_of(run)
+
+    send_buffer = lambda seq: sock.sendto(packets.data(1, 1001, seq, now), addr)
+    send_build = lambda seq: sock.sendto(
+        client.build_packet(1, client.MSG_DATA, 1001, seq, now, BATCH_SIZE,
+                            client.build_payload(BATCH_SIZE)[0]), addr)
+    buffer_blocks, buffer_bytes = count_send_allocations(send_buffer, sink)
+    build_blocks, build_bytes = count_send_allocations(send_build, sink)
+    sock.close()
+    sink.close()
+
+    return {
+        "client_send_ns": metric(elapsed / CLIENT_SENDS * 1e9, "ns/send", "lower", spread),
+        "client_send_alloc_blocks": metric(buffer_blocks, "blocks/send", "lower"),
+        "client_send_alloc_bytes": metric(buffer_bytes, "bytes/send", "lower"),
+        "client_build_send_alloc_blocks": metric(build_blocks, "blocks/send", "lower"),
+        "client_build_send_alloc_bytes": metric(build_bytes, "bytes/send", "lower"),
+    }
+
+def free_udp_port(host):
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    probe.bind((host, 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+def bench_end_to_end():
+    host = "127.0.0.1"
+    port = free_udp_port(host)
+    payload, _ = client.build_payload(BATCH_SIZE)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "e2e.csv")
+
+        reset_server_state()
+        server_thread = threading.Thread(
+            target=server.server_loop, args=(host, port, csv_path), daemon=True
+        )
+        server_thread.start()
+        time.sleep(0.5)
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        addr = (host, port)
+        send_start = time.perf_counter()
+        for seq in range(E2E_PACKETS):
+            pkt = client.build_packet(1, client.MSG_DATA, 1001, seq & 0xFFFF, time.time(), BATCH_SIZE, payload)
+            sock.sendto(pkt, addr)
+        send_elapsed = time.perf_counter() - send_start
+        sock.close()
+
+        # Give the collector time to drain its socket buffer before stopping it.
+        time.sleep(1.5)
+        server.shutdown_event.set()
+        server_thread.join()
+        reset_server_state()
+
+        arrivals = []
+        with open(csv_path, "r") as f:
+            for row in csv.DictReader(f):
+                arrivals.append(float(row["arrival_time"]))
+
+    received = len(arrivals)
+    span = max(arrivals) - min(arrivals) if received > 1 else 0.0
+    return {
+        # A single saturation run through real sockets and threads: reported
+        # for trend-watching, but too noisy to gate on.
+        "e2e_packets_per_sec": metric(received / span if span > 0 else 0.0, "packets/s", "higher", gate=False),
+        "e2e_drop_rate": metric((E2E_PACKETS - received) / E2E_PACKETS, "ratio", "lower", gate=False),
+        "e2e_send_rate": metric(E2E_PACKETS / send_elapsed, "packets/s", "higher", gate=False),
+    }
+
+def run_suite(skip_e2e=False):
+    results = {}
+
+    log("build_packet / build_payload ...")
+    results["build_packet_ops_per_sec"] = bench_build_packet()
+    results["build_payload_ops_per_sec"] = bench_build_payload()
+
+    log("client startup / per-send cost ...")
+    results["client_startup_import_us"] = bench_client_startup()
+    results.update(bench_client_send())
+
+    for name, (dup_rate, gap_rate) in PACKET_MIXES.items():
+        log(f"process_packet ({name}) ...")
+        results[f"process_packet_ns_{name}"] = bench_process_packet(dup_rate, gap_rate)
+
+    log("device state memory ...")
+    results["device_state_bytes_per_device"] = bench_device_memory()
+
+    log("CSV writes ...")
+    results["csv_rows_per_sec"] = bench_csv_write()
+
+    if not skip_e2e:
+        log("loopback end-to-end ...")
+        results.update(bench_end_to_end())
+
+    return results
+
+def compare(current, baseline, threshold):
+    regressions = []
+    missing = [name for name in baseline if name not in current]
+
+    print(f"\n{'Metric':<36} | {'Baseline':>14} | {'Current':>14} | {'Change':>8} | {'Noise':>7}")
+    print("-" * 92)
+    for name, entry in current.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<36} | {'-':>14} | {entry['value']:>14.2f} | {'new':>8} | {'-':>7}")
+            continue
+
+        old, new = base["value"], entry["value"]
+        # Baselines written before spreads were recorded count as noise-free.
+        noise = base.get("spread", 0.0) + entry.get("spread", 0.0)
+        if entry["unit"] == "ratio" or old == 0:
+            # Ratios like the drop rate, and anything whose baseline is zero,
+            # have no meaningful relative change, so compare them absolutely.
+            change = new - old
+            limit = threshold
+            row = f"{name:<36} | {old:>14.2f} | {new:>14.2f} | {change:>+8.2f}"
+        else:
+            change = (new - old) / old
+            # A change only counts once it clears both the threshold and the
+            # repeat-to-repeat spread seen in either run.
+            limit = max(threshold, noise)
+            row = f"{name:<36} | {old:>14.2f} | {new:>14.2f} | {change:>+8.1%}"
+
+        if entry["better"] == "higher":
+            regressed = change < -limit
+        else:
+            regressed = change > limit
+
+        gated = entry.get("gate", True)
+        note = "" if gated else "  (not gated)"
+        print(f"{row} | {noise:>7.1%}{note}")
+        if regressed and gated:
+            regressions.append(name)
+
+    for name in missing:
+        print(f"{name:<36} | {baseline[name]['value']:>14.2f} | {'-':>14} | {'missing':>8} | {'-':>7}")
+    print("-" * 92)
+
+    if missing:
+        log(f"[WARN] Not measured in this run: {', '.join(missing)}")
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="IoTStream benchmark suite")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", metavar="BASELINE_JSON")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--skip-e2e", action="store_true")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        if os.path.abspath(args.compare) == os.path.abspath(args.output):
+            parser.error("--output would overwrite the --compare baseline; pick another path")
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)["metrics"]
+
+    metrics = run_suite(skip_e2e=args.skip_e2e)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "metrics": metrics,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    log(f"Results written to {args.output}")
+
+    if baseline is None:
+        for name, entry in metrics.items():
+            print(f"{name:<36} {entry['value']:>14.2f} {entry['unit']}")
+        return
+
+    regressions = compare(metrics, baseline, args.threshold)
+    if regressions:
+        log(f"[FAIL] Regressed beyond {args.threshold:.0%} and the measured noise: {', '.join(regressions)}")
+        sys.exit(1)
+    log(f"[PASS] No gated metric regressed beyond {args.threshold:.0%} and the measured noise")
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,37 @@
 import socket
 import struct
 import time
-import argparse
 import random
-import sys
 
 HEADER_FMT = "!BBHHIBB"
 HEADER_SIZE = struct.calcsize(HEADER_FMT)
+HEADER_STRUCT = struct.Struct(HEADER_FMT)
+READING_STRUCT = struct.Struct("!f")
 
 MSG_INIT = 0
 MSG_DATA = 1
 MSG_HEARTBEAT = 2
 
+LOG_DEBUG = "debug"
+LOG_INFO = "info"
+LOG_QUIET = "quiet"
+LOG_LEVELS = (LOG_DEBUG, LOG_INFO, LOG_QUIET)
+
+ARG_DEFAULTS = {
+    "host": "127.0.0.1",
+    "port": 5005,
+    "device": 1001,
+    "interval": 1.0,
+    "batch": 5,
+    "log_level": LOG_DEBUG,
+}
+# Command-line spelling of each option, e.g. "log-level" -> "log_level".
+ARG_OPTIONS = {key.replace("_", "-"): key for key in ARG_DEFAULTS}
+
 def build_packet(version, msg_type, device_id, seq_num, send_ts_float, batching_flag=0, payload=b''):
     ts_masked = int(send_ts_float * 1000) & 0xFFFFFFFF
 
-    temp_header = struct.pack(
-        HEADER_FMT,
+    temp_header = HEADER_STRUCT.pack(
         version,
         msg_type,
         device_id,
@@ -28,8 +43,7 @@ def build_packet(version, msg_type, device_id, seq_num, send_ts_float, batching_
 
     checksum = sum(temp_header) & 0xFF
 
-    final_header = struct.pack(
-        HEADER_FMT,
+    final_header = HEADER_STRUCT.pack(
         version,
         msg_type,
         device_id,
@@ -42,74 +56,169 @@ def build_packet(version, msg_type, device_id, seq_num, send_ts_float, batching_
     return final_header + payload
 
 def build_payload(batch_size):
-    readings = [round(random.uniform(20.0, 30.0), 2) for _ in range(batch_size)]
+    rand = random.random
+    readings = [round(20.0 + 10.0 * rand(), 2) for _ in range(batch_size)]
     fmt = "!" + "f" * batch_size
     return struct.pack(fmt, *readings), readings
 
+class PacketBuffer:
+    # One buffer reused for every send: HEARTBEAT goes out as the header view,
+    # DATA as the full view with readings packed in place after the header.
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.buf = bytearray(HEADER_SIZE + READING_STRUCT.size * batch_size)
+        view = memoryview(self.buf)
+        self.header_view = view[:HEADER_SIZE]
+        self.data_view = view
+
+    def pack_header(self, version, msg_type, device_id, seq_num, send_ts_float, batching_flag=0):
+        ts_masked = int(send_ts_float * 1000) & 0xFFFFFFFF
+
+        HEADER_STRUCT.pack_into(
+            self.buf,
+            0,
+            version,
+            msg_type,
+            device_id,
+            seq_num,
+            ts_masked,
+            batching_flag,
+            0
+        )
+
+        # The checksum byte is still zero here, so summing the whole header
+        # gives the same value as summing the header packed with checksum=0.
+        # Summing the existing view avoids slicing a new bytearray per send.
+        self.buf[HEADER_SIZE - 1] = sum(self.header_view) & 0xFF
+
+    def header(self, version, msg_type, device_id, seq_num, send_ts_float):
+        self.pack_header(version, msg_type, device_id, seq_num, send_ts_float)
+        return self.header_view
+
+    def data(self, version, device_id, seq_num, send_ts_float, rand=random.random):
+        buf = self.buf
+        pack_into = READING_STRUCT.pack_into
+        offset = HEADER_SIZE
+        for _ in range(self.batch_size):
+            pack_into(buf, offset, round(20.0 + 10.0 * rand(), 2))
+            offset += READING_STRUCT.size
+        self.pack_header(version, MSG_DATA, device_id, seq_num, send_ts_float, self.batch_size)
+        return self.data_view
+
+    def readings(self):
+        fmt = "!" + "f" * self.batch_size
+        return [round(r, 2) for r in struct.unpack_from(fmt, self.buf, HEADER_SIZE)]
+
 def log(msg):
     print(f"[Client] {msg}")
 
-def client_loop(host, port, device_id, interval, batch_size):
+def client_loop(host, port, device_id, interval, batch_size, log_level=LOG_DEBUG):
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     addr = (host, port)
+    packets = PacketBuffer(batch_size)
+
+    # Resolved once so the send loop never builds a message nobody will read.
+    info = log_level != LOG_QUIET
+    debug = log_level == LOG_DEBUG
 
     seq_num = 0
     version = 1
 
-    log(f"Started → Target: {host}:{port} | Interval: {interval}s | BatchSize: {batch_size}")
+    if info:
+        log(f"Started → Target: {host}:{port} | Interval: {interval}s | BatchSize: {batch_size}")
 
-    packet = build_packet(version, MSG_INIT, device_id, seq_num, time.time())
-    sock.sendto(packet, addr)
-    log(f"Sent INIT → Dev:{device_id}, Seq:{seq_num}")
+    sock.sendto(packets.header(version, MSG_INIT, device_id, seq_num, time.time()), addr)
+    if debug:
+        log(f"Sent INIT → Dev:{device_id}, Seq:{seq_num}")
     seq_num += 1
 
+    rand = random.random
+    sleep = time.sleep
+    now = time.time
+    jitter_span = 0.2 * interval
+    jitter_base = interval - 0.1 * interval
+
     try:
         while True:
-            jitter = random.uniform(-0.1, 0.1) * interval
-            time.sleep(max(0, interval + jitter))
+            sleep(max(0, jitter_base + jitter_span * rand()))
 
-            send_ts = time.time()
+            send_ts = now()
+            heartbeat = rand() < 0.2
 
-            if random.random() < 0.2:
-                packet = build_packet(version, MSG_HEARTBEAT, device_id, seq_num, send_ts)
-                log_msg = f"Sent HEARTBEAT → Dev:{device_id}, Seq:{seq_num}"
+            if heartbeat:
+                packet = packets.header(version, MSG_HEARTBEAT, device_id, seq_num, send_ts)
             else:
-                payload_bytes, readings = build_payload(batch_size)
-                packet = build_packet(
-                    version,
-                    MSG_DATA,
-                    device_id,
-                    seq_num,
-                    send_ts,
-                    batching_flag=batch_size,
-                    payload=payload_bytes
-                )
-                log_msg = f"Sent DATA (Batch {batch_size}) → Seq:{seq_num}, Readings:{readings}"
+                packet = packets.data(version, device_id, seq_num, send_ts, rand)
 
             try:
                 sock.sendto(packet, addr)
-                log(log_msg)
+                if debug:
+                    if heartbeat:
+                        log(f"Sent HEARTBEAT → Dev:{device_id}, Seq:{seq_num}")
+                    else:
+                        log(f"Sent DATA (Batch {batch_size}) → Seq:{seq_num}, Readings:{packets.readings()}")
                 seq_num += 1
             except Exception as e:
-                log(f"Socket send error: {e}")
+                if info:
+                    log(f"Socket send error: {e}")
 
     except KeyboardInterrupt:
-        log("Stopping client manually.")
+        if info:
+            log("Stopping client manually.")
     finally:
         sock.close()
 
-def parse_args():
+def fast_parse_args(argv):
+    # Handles the plain "--name value" / "--name=value" forms the experiment
+    # scripts use, so sensors don't pay for importing argparse on every boot.
+    # Anything else (help, typos, bad values) returns None for argparse.
+    args = dict(ARG_DEFAULTS)
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if not arg.startswith("--"):
+            return None
+        name, sep, value = arg[2:].partition("=")
+        if not sep:
+            if i + 1 >= len(argv):
+                return None
+            value = argv[i + 1]
+            i += 1
+        i += 1
+
+        key = ARG_OPTIONS.get(name)
+        if key is None:
+            return None
+        try:
+            args[key] = type(ARG_DEFAULTS[key])(value)
+        except ValueError:
+            return None
+
+    if args["log_level"] not in LOG_LEVELS:
+        return None
+    return args
+
+def parse_args(argv=None):
+    import sys
+    argv = sys.argv[1:] if argv is None else argv
+
+    args = fast_parse_args(argv)
+    if args is not None:
+        return args
+
+    import argparse
     p = argparse.ArgumentParser(description="IoT Sensor Client")
-    p.add_argument("--host", default="127.0.0.1")
-    p.add_argument("--port", type=int, default=5005)
-    p.add_argument("--device", type=int, default=1001)
-    p.add_argument("--interval", type=float, default=1.0)
-    p.add_argument("--batch", type=int, default=5)
-    return p.parse_args()
+    p.add_argument("--host", default=ARG_DEFAULTS["host"])
+    p.add_argument("--port", type=int, default=ARG_DEFAULTS["port"])
+    p.add_argument("--device", type=int, default=ARG_DEFAULTS["device"])
+    p.add_argument("--interval", type=float, default=ARG_DEFAULTS["interval"])
+    p.add_argument("--batch", type=int, default=ARG_DEFAULTS["batch"])
+    p.add_argument("--log-level", choices=LOG_LEVELS, default=ARG_DEFAULTS["log_level"])
+    return vars(p.parse_args(argv))
 
 def main():
     args = parse_args()
-    client_loop(args.host, args.port, args.device, args.interval, args.batch)
+    client_loop(args["host"], args["port"], args["device"], args["interval"], args["batch"], args["log_level"])
 
 if __name__ == "__main__":
     main()
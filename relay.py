@@ -0,0 +1,223 @@
+import socket
+import struct
+import threading
+import time
+import json
+from collections import deque
+from typing import List, Optional, Sequence
+
+RELAY_RAW = "raw"
+RELAY_RECORD = "record"
+
+DEFAULT_QUEUE_SIZE = 1024
+TCP_CONNECT_TIMEOUT = 1.0
+TCP_RETRY_DELAY = 2.0
+TCP_FRAME_FMT = "!H"
+
+class DatagramTransport:
+    def __init__(self, family, target):
+        self.family = family
+        self.target = target
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+
+    def send(self, message: bytes):
+        self.sock.sendto(message, self.target)
+
+    def ready_in(self) -> float:
+        return 0.0
+
+    def reset(self):
+        pass
+
+    def close(self):
+        self.sock.close()
+
+class TcpTransport:
+    def __init__(self, target, framed: bool):
+        self.target = target
+        self.framed = framed
+        self.sock: Optional[socket.socket] = None
+        self.retry_at = 0.0
+
+    def send(self, message: bytes):
+        if self.sock is None:
+            self.sock = socket.create_connection(self.target, timeout=TCP_CONNECT_TIMEOUT)
+            self.sock.settimeout(None)
+
+        if self.framed:
+            self.sock.sendall(struct.pack(TCP_FRAME_FMT, len(message)) + message)
+        else:
+            self.sock.sendall(message + b"\n")
+
+    def ready_in(self) -> float:
+        # Seconds left in the reconnect backoff; 0 once a send may be tried.
+        if self.sock is not None:
+            return 0.0
+        return max(0.0, self.retry_at - time.monotonic())
+
+    def reset(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self.retry_at = time.monotonic() + TCP_RETRY_DELAY
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+def parse_target(spec: str, mode: str):
+    scheme, sep, rest = spec.partition("://")
+    if not sep:
+        raise ValueError(f"Relay target must look like scheme://address, got {spec!r}")
+
+    if scheme == "unix":
+        if not hasattr(socket, "AF_UNIX"):
+            raise ValueError("Unix sockets are not supported on this platform")
+        return DatagramTransport(socket.AF_UNIX, rest)
+
+    host, _, port = rest.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"Relay target needs host:port, got {spec!r}")
+    target = (host, int(port))
+
+    if scheme == "udp":
+        return DatagramTransport(socket.AF_INET, target)
+    if scheme == "tcp":
+        # Raw datagrams are binary, so they get a length prefix on a stream;
+        # records are JSON and are newline-delimited instead.
+        return TcpTransport(target, framed=(mode == RELAY_RAW))
+    raise ValueError(f"Unknown relay scheme {scheme!r} (use udp, tcp or unix)")
+
+class Subscriber:
+    def __init__(self, spec: str, mode: str, columns: Sequence[str], queue_size: int):
+        self.spec = spec
+        self.mode = mode
+        self.columns = list(columns)
+        self.transport = parse_target(spec, mode)
+        self.queue: deque = deque(maxlen=queue_size)
+        self.cond = threading.Condition()
+        self.closed = False
+
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.send_errors = 0
+        self.max_lag = 0
+
+        self.thread = threading.Thread(target=self.run, name=f"relay:{spec}", daemon=True)
+        self.thread.start()
+
+    def offer(self, item):
+        with self.cond:
+            # deque(maxlen=...) evicts the oldest entry itself; we only count it.
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(item)
+            self.enqueued += 1
+            if len(self.queue) > self.max_lag:
+                self.max_lag = len(self.queue)
+            self.cond.notify()
+
+    def encode(self, item) -> bytes:
+        if self.mode == RELAY_RAW:
+            return item
+        return json.dumps(dict(zip(self.columns, item))).encode()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while True:
+                    if self.queue:
+                        # While the transport backs off, items stay queued so an
+                        # outage shows up as lag and drop-oldest, not lost sends.
+                        delay = self.transport.ready_in()
+                        if delay <= 0:
+                            break
+                        if self.closed:
+                            return
+                        self.cond.wait(delay)
+                    elif self.closed:
+                        return
+                    else:
+                        self.cond.wait()
+                item = self.queue.popleft()
+
+            try:
+                self.transport.send(self.encode(item))
+                self.sent += 1
+            except OSError:
+                self.send_errors += 1
+                self.transport.reset()
+
+    def close(self, timeout: float):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join(timeout)
+        self.transport.close()
+
+    def stats(self) -> dict:
+        with self.cond:
+            lag = len(self.queue)
+        return {
+            "target": self.spec,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "send_errors": self.send_errors,
+            "lag": lag,
+            "max_lag": self.max_lag,
+        }
+
+class Relay:
+    def __init__(self, specs: Sequence[str], mode: str, columns: Sequence[str],
+                 queue_size: int = DEFAULT_QUEUE_SIZE, report_interval: float = 0.0):
+        self.mode = mode
+        self.subscribers: List[Subscriber] = [
+            Subscriber(spec, mode, columns, queue_size) for spec in specs
+        ]
+        self.stop_event = threading.Event()
+        self.reporter: Optional[threading.Thread] = None
+        if report_interval > 0:
+            self.reporter = threading.Thread(
+                target=self.report_loop, args=(report_interval,), daemon=True
+            )
+            self.reporter.start()
+
+    def publish_raw(self, data: bytes):
+        # bytes are immutable, so every queue shares the received object as-is.
+        for sub in self.subscribers:
+            sub.offer(data)
+
+    def publish_record(self, row):
+        for sub in self.subscribers:
+            sub.offer(row)
+
+    def report(self):
+        for s in (sub.stats() for sub in self.subscribers):
+            print(
+                f"[RELAY] {s['target']}: sent={s['sent']} dropped={s['dropped']} "
+                f"errors={s['send_errors']} lag={s['lag']} max_lag={s['max_lag']}"
+            )
+
+    def report_loop(self, interval: float):
+        while not self.stop_event.wait(interval):
+            self.report()
+
+    def close(self, timeout: float = 2.0):
+        self.stop_event.set()
+        for sub in self.subscribers:
+            sub.close(timeout)
+        self.report()
+
+class RelayWriter:
+    # Wraps the CSV writer so every logged row is also offered to the relay,
+    # without process_packet needing to know the relay exists.
+    def __init__(self, writer, relay: Relay):
+        self.writer = writer
+        self.relay = relay
+
+    def writerow(self, row):
+        self.writer.writerow(row)
+        self.relay.publish_record(row)
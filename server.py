@@ -6,7 +6,12 @@ import argparse
 import threading
 import signal
 import sys
-from typing import Dict, Set
+import os
+import cProfile
+from collections import Counter
+from typing import Dict, Set, Optional
+
+from relay import Relay, RelayWriter, RELAY_RAW, RELAY_RECORD, DEFAULT_QUEUE_SIZE
 
 HEADER_FMT = "!BBHHIBB"
 HEADER_SIZE = struct.calcsize(HEADER_FMT)
@@ -26,19 +31,126 @@ class DeviceState:
 
 device_states: Dict[int, DeviceState] = {}
 
-def process_packet(data: bytes, addr, csv_writer):
+class RuntimeProfiler:
+    # Nothing here touches the packet path: profiling only costs anything
+    # between the signal that starts it and the one (or timer) that stops it.
+    def __init__(self, out_dir: str, seconds: float, sample_interval: float):
+        self.out_dir = out_dir
+        self.seconds = seconds
+        self.sample_interval = sample_interval
+        self.profile: Optional[cProfile.Profile] = None
+        self.profile_timer: Optional[threading.Timer] = None
+        self.sampler_thread: Optional[threading.Thread] = None
+        self.sampler_stop = threading.Event()
+        self.sampling = False
+
+    def duration_label(self) -> str:
+        return f"{self.seconds}s" if self.seconds > 0 else "until toggled"
+
+    def output_path(self, kind: str, ext: str) -> str:
+        now = time.time()
+        # Milliseconds keep a restarted sampler from overwriting the file its
+        # predecessor wrote within the same second.
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(now)) + f"_{int(now * 1000) % 1000:03d}"
+        return os.path.join(self.out_dir, f"server_{kind}_{stamp}_{os.getpid()}.{ext}")
+
+    def toggle_cprofile(self):
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+            if self.seconds > 0:
+                # The timer re-sends the signal so the profiler is always
+                # disabled from the main thread, the one it is attached to.
+                self.profile_timer = threading.Timer(
+                    self.seconds, os.kill, (os.getpid(), signal.SIGUSR1)
+                )
+                self.profile_timer.daemon = True
+                self.profile_timer.start()
+            print(f"[PROFILE] cProfile started ({self.duration_label()})")
+            return
+
+        self.profile.disable()
+        if self.profile_timer is not None:
+            self.profile_timer.cancel()
+            self.profile_timer = None
+        path = self.output_path("cprofile", "pstats")
+        try:
+            self.profile.dump_stats(path)
+            print(f"[PROFILE] cProfile stopped → {path}")
+        except OSError as e:
+            print(f"[ERROR] Failed to write profile: {e}")
+        self.profile = None
+
+    def toggle_sampler(self):
+        if self.sampling:
+            self.sampler_stop.set()
+            return
+
+        if self.sampler_thread is not None and self.sampler_thread.is_alive():
+            # The previous sampler has stopped sampling but is still writing
+            # its file; let it finish so this request starts a fresh one.
+            self.sampler_thread.join()
+
+        self.sampler_stop.clear()
+        self.sampling = True
+        self.sampler_thread = threading.Thread(
+            target=self.sample_loop,
+            args=(threading.main_thread().ident,),
+            daemon=True,
+        )
+        self.sampler_thread.start()
+        print(f"[PROFILE] Sampler started ({self.duration_label()}, every {self.sample_interval}s)")
+
+    def sample_loop(self, thread_id: int):
+        counts: Counter = Counter()
+        deadline = time.monotonic() + self.seconds if self.seconds > 0 else None
+
+        while not self.sampler_stop.wait(self.sample_interval):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                counts[";".join(reversed(stack))] += 1
+        self.sampling = False
+
+        # Collapsed-stack format, one "frame;frame;frame count" per line,
+        # as consumed by flamegraph.pl and speedscope.
+        path = self.output_path("samples", "collapsed")
+        try:
+            with open(path, "w") as f:
+                for stack, count in counts.most_common():
+                    f.write(f"{stack} {count}\n")
+            print(f"[PROFILE] Sampler stopped ({sum(counts.values())} samples) → {path}")
+        except OSError as e:
+            print(f"[ERROR] Failed to write samples: {e}")
+
+    def stop_all(self):
+        if self.profile is not None:
+            self.toggle_cprofile()
+        if self.sampler_thread is not None and self.sampler_thread.is_alive():
+            self.sampler_stop.set()
+            self.sampler_thread.join()
+
+profiler: Optional[RuntimeProfiler] = None
+
+def process_packet(data: bytes, addr, csv_writer) -> bool:
     start_cpu = time.process_time()
     arrival_time = time.time()
 
     if len(data) < HEADER_SIZE:
-        return
+        return False
 
     try:
         version, msg_type, device_id, seq_num, send_ts, batching_flag, checksum = struct.unpack(
             HEADER_FMT, data[:HEADER_SIZE]
         )
     except struct.error:
-        return
+        return False
 
     device_id = int(device_id)
     seq_num = int(seq_num)
@@ -81,8 +193,11 @@ def process_packet(data: bytes, addr, csv_writer):
         csv_writer.writerow(csv_row)
     except Exception as e:
         print(f"[ERROR] CSV write failed: {e}")
+        return False
+
+    return True
 
-def server_loop(host: str, port: int, csv_path: str):
+def server_loop(host: str, port: int, csv_path: str, relay: Optional[Relay] = None):
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     sock.bind((host, port))
@@ -97,12 +212,20 @@ def server_loop(host: str, port: int, csv_path: str):
 
         print(f"=== Logging to: {csv_path} ===\n")
 
+        relay_raw = relay is not None and relay.mode == RELAY_RAW
+        if relay is not None and relay.mode == RELAY_RECORD:
+            writer = RelayWriter(writer, relay)
+
         try:
             while not shutdown_event.is_set():
                 try:
                     data, addr = sock.recvfrom(4096)
-                    process_packet(data, addr, writer)
+                    accepted = process_packet(data, addr, writer)
                     f.flush()
+                    # Only forward what the collector logged, so subscribers
+                    # never see datagrams that failed header parsing.
+                    if relay_raw and accepted:
+                        relay.publish_raw(data)
                 except socket.timeout:
                     continue
                 except KeyboardInterrupt:
@@ -116,17 +239,51 @@ def server_loop(host: str, port: int, csv_path: str):
 def handle_signal(sig, frame):
     shutdown_event.set()
 
+def handle_profile_signal(sig, frame):
+    if profiler is None:
+        return
+    if sig == signal.SIGUSR1:
+        profiler.toggle_cprofile()
+    else:
+        profiler.toggle_sampler()
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--host", default="0.0.0.0")
     parser.add_argument("--port", type=int, default=5005)
     parser.add_argument("--csv", default="server_log.csv")
+    parser.add_argument("--profile-dir", default=".")
+    parser.add_argument("--profile-seconds", type=float, default=30.0)
+    parser.add_argument("--sample-interval", type=float, default=0.005)
+    parser.add_argument("--relay", action="append", default=[], metavar="SCHEME://ADDR")
+    parser.add_argument("--relay-mode", choices=[RELAY_RAW, RELAY_RECORD], default=RELAY_RAW)
+    parser.add_argument("--relay-queue", type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument("--relay-report", type=float, default=0.0)
     args = parser.parse_args()
 
+    relay = None
+    if args.relay:
+        try:
+            relay = Relay(args.relay, args.relay_mode, CSV_COLUMNS, args.relay_queue, args.relay_report)
+        except (ValueError, OSError) as e:
+            parser.error(str(e))
+
     signal.signal(signal.SIGINT, handle_signal)
     signal.signal(signal.SIGTERM, handle_signal)
 
-    server_loop(args.host, args.port, args.csv)
+    global profiler
+    if hasattr(signal, "SIGUSR1"):
+        profiler = RuntimeProfiler(args.profile_dir, args.profile_seconds, args.sample_interval)
+        signal.signal(signal.SIGUSR1, handle_profile_signal)
+        signal.signal(signal.SIGUSR2, handle_profile_signal)
+
+    try:
+        server_loop(args.host, args.port, args.csv, relay)
+    finally:
+        if relay is not None:
+            relay.close()
+        if profiler is not None:
+            profiler.stop_all()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file